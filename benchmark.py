@@ -0,0 +1,407 @@
+# benchmark.py — Offline throughput benchmark for scrape → store → post
+#
+# Everything runs locally, nothing touches uiiumovie.fun, arolinks, Atlas or Telegram:
+#   * a fixture HTTP server replaying listing / inner pages (saved pages from
+#     --fixtures, or generated ones) plus thumbnails
+#   * a fake shortener API and a fake Telegram Bot API on the same server
+#   * mongomock (default) or a local mongod via --mongo-uri
+#
+# Usage:
+#   python benchmark.py --pages 5 --movies 24 --latency-ms 50
+#   python benchmark.py --fixtures ./saved_pages --mongo-uri mongodb://localhost:27017
+#
+# Saved fixtures: page_<n>.html for listing pages and any other *.html file
+# for inner pages, served under /<file stem>/. Absolute links to the live site
+# are rewritten to the fixture server.
+
+import os
+import re
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from collections import defaultdict
+from functools import wraps
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+LIVE_SITE = "https://uiiumovie.fun"
+BENCH_TOKEN = "123456:BENCHMARK"
+FAKE_JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 20000 + b"\xff\xd9"
+
+
+# ------------------------------------------------
+# FIXTURE PAGES
+# ------------------------------------------------
+def generated_listing(page, movies, base):
+    """Listing page with the same structure the extractors expect."""
+    randoms = "".join(
+        f'<div class="gmr-item-modulepost"><a href="{base}/movie-r{page}-{i}/">x</a>'
+        f'<img src="{base}/img/r{page}-{i}.jpg" alt="Random Movie {page}-{i}"></div>'
+        for i in range(max(movies // 4, 1)))
+    latest = "".join(
+        f'<article><a itemprop="url" href="{base}/movie-l{page}-{i}/">x</a>'
+        f'<img src="{base}/img/l{page}-{i}.jpg" alt="Latest Movie {page}-{i}"></article>'
+        for i in range(movies - max(movies // 4, 1)))
+    filler = "<p>Lorem ipsum <b>dolor</b> sit amet</p>" * 300
+    return (f"<html><head><title>Page {page}</title></head><body>{filler}"
+            f'<h3>Random Movie</h3><div class="grid-container">{randoms}</div>'
+            f'<h3>Latest Movie</h3><div id="gmr-main-load">{latest}</div>'
+            f"{filler}</body></html>")
+
+
+def generated_inner(slug):
+    links = "".join(f'<a href="https://files.example/{slug}/{q}">{q}</a>'
+                    for q in ("480p", "720p", "1080p"))
+    filler = "<p>Lorem ipsum <b>dolor</b> sit amet</p>" * 300
+    return (f'<html><body>{filler}<span class="runtime">120 min</span>'
+            f'<div id="download">{links}</div>{filler}</body></html>')
+
+
+class FixtureSite:
+    """Serves listing/inner pages, thumbnails, the fake shortener and the fake Bot API."""
+
+    def __init__(self, fixtures_dir=None, movies_per_page=24, latency=0.0,
+                 flood_every=0):
+        self.fixtures_dir = fixtures_dir
+        self.movies_per_page = movies_per_page
+        self.latency = latency
+        self.flood_every = flood_every
+        self.hits = defaultdict(int)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def count(self, key):
+        with self._lock:
+            self.hits[key] += 1
+            return self.hits[key]
+
+    def page_html(self, path):
+        match = re.match(r"^/page/(\d+)/?$", path)
+        if self.fixtures_dir:
+            name = f"page_{match.group(1)}.html" if match else path.strip("/") + ".html"
+            file_path = os.path.join(self.fixtures_dir, name)
+            if not os.path.exists(file_path):
+                return None
+            with open(file_path, encoding="utf-8") as f:
+                return f.read().replace(LIVE_SITE, self.base)
+        if match:
+            return generated_listing(int(match.group(1)), self.movies_per_page, self.base)
+        return generated_inner(path.strip("/"))
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if site.latency:
+                    time.sleep(site.latency)
+
+                if url.path == "/api":
+                    # Fake shortener: {"status": "success", "shortenedUrl": ...}
+                    site.count("shortener")
+                    long_url = parse_qs(url.query).get("url", [""])[0]
+                    short = f"{site.base}/s/{abs(hash(long_url)) % 10**8}"
+                    body = json.dumps({"status": "success", "shortenedUrl": short})
+                    return self._send(200, body.encode(), "application/json")
+
+                if url.path.startswith("/img/") or url.path.lower().endswith(
+                        (".jpg", ".jpeg", ".png", ".webp")):
+                    site.count("image")
+                    return self._send(200, FAKE_JPEG, "image/jpeg")
+
+                site.count("listing" if url.path.startswith("/page/") else "inner")
+                html = site.page_html(url.path)
+                if html is None:
+                    return self._send(404, b"not found", "text/html")
+                return self._send(200, html.encode(), "text/html; charset=utf-8")
+
+            def do_POST(self):
+                # Fake Telegram Bot API: /bot<token>/<method>
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = self.rfile.read(length)
+                method = self.path.rsplit("/", 1)[-1]
+                calls = site.count(f"telegram:{method}")
+                if site.latency:
+                    time.sleep(site.latency)
+
+                if site.flood_every and calls % site.flood_every == 0:
+                    body = {"ok": False, "error_code": 429,
+                            "description": "Too Many Requests: retry after 1",
+                            "parameters": {"retry_after": 1}}
+                    return self._send(429, json.dumps(body).encode(), "application/json")
+
+                message = {"message_id": calls, "date": int(time.time()),
+                           "chat": {"id": -100, "type": "channel"}}
+                if method == "sendMediaGroup":
+                    items = len(re.findall(rb'"type":\s*"photo"', payload))
+                    album = [dict(message, message_id=calls * 100 + i,
+                                  photo=[{"file_id": f"photo-{calls}-{i}",
+                                          "file_unique_id": f"u{calls}-{i}",
+                                          "width": 300, "height": 450}])
+                             for i in range(items)]
+                    body = {"ok": True, "result": album}
+                    return self._send(200, json.dumps(body).encode(), "application/json")
+                if method == "sendPhoto":
+                    message["photo"] = [{"file_id": f"photo-{calls}",
+                                         "file_unique_id": f"u{calls}",
+                                         "width": 300, "height": 450}]
+                else:
+                    message["text"] = "ok"
+                body = {"ok": True, "result": message}
+                return self._send(200, json.dumps(body).encode(), "application/json")
+
+        return Handler
+
+
+# ------------------------------------------------
+# MEASUREMENT
+# ------------------------------------------------
+stage_latencies = defaultdict(list)
+db_ops = defaultdict(int)
+db_phase = ["setup"]
+db_errors = []  # failed DB calls; the app only logs them, so the run must not pass
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(stage, func):
+    """Wraps a sync or async function and records its latency under `stage`."""
+    if asyncio.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                stage_latencies[stage].append(time.perf_counter() - started)
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stage_latencies[stage].append(time.perf_counter() - started)
+    return wrapper
+
+
+def count_mongomock_ops():
+    """Counts every collection call as one round trip (mongomock has no command events)."""
+    import mongomock
+
+    for name in ("find", "find_one", "insert_one", "insert_many", "update_one",
+                 "update_many", "delete_one", "delete_many", "bulk_write",
+                 "count_documents", "aggregate", "find_one_and_update"):
+        original = getattr(mongomock.Collection, name)
+
+        def make(name, original):
+            def counted(self, *args, **kwargs):
+                db_ops[db_phase[0]] += 1
+                try:
+                    return original(self, *args, **kwargs)
+                except Exception as e:
+                    db_errors.append(f"{self.name}.{name}: {e!r}")
+                    raise
+            return counted
+        setattr(mongomock.Collection, name, make(name, original))
+
+
+def patch_mongomock_bulk():
+    """
+    pymongo 4.11+ passes `sort` to every bulk update/replace, which mongomock
+    4.3 does not accept. The app never sorts bulk writes: sort=None is dropped,
+    any other sort raises NotImplementedError instead of being ignored.
+    """
+    from mongomock.collection import BulkOperationBuilder
+
+    for name in ("add_update", "add_replace"):
+        original = getattr(BulkOperationBuilder, name)
+
+        def make(original):
+            def add(self, *args, sort=None, **kwargs):
+                if sort is not None:
+                    raise NotImplementedError("mongomock: sorted bulk writes")
+                return original(self, *args, **kwargs)
+            return add
+        setattr(BulkOperationBuilder, name, make(original))
+
+
+def count_pymongo_ops():
+    from pymongo import monitoring
+
+    class Listener(monitoring.CommandListener):
+        def started(self, event):
+            if event.command_name not in ("hello", "isMaster", "ping", "endSessions"):
+                db_ops[db_phase[0]] += 1
+
+        def succeeded(self, event):
+            pass
+
+        def failed(self, event):
+            db_errors.append(f"{event.command_name}: {event.failure}")
+
+    monitoring.register(Listener())
+
+
+# ------------------------------------------------
+# RUN
+# ------------------------------------------------
+def setup_environment(args, site):
+    os.environ["SHORTENER_API_URL"] = f"{site.base}/api"
+    os.environ["POST_RATE_PER_MINUTE"] = str(args.post_rate)
+    os.environ["POST_BURST"] = str(args.post_rate)
+    os.environ.setdefault("INCREMENTAL_SCRAPE", "1")
+    if args.media_group:
+        os.environ["POST_MEDIA_GROUP"] = "1"
+
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+        count_pymongo_ops()
+        import pymongo
+        client = pymongo.MongoClient(args.mongo_uri)
+        client.drop_database("uiiu_scraper")  # start from an empty database
+    else:
+        import mongomock
+        import pymongo
+        shared = mongomock.MongoClient()
+        pymongo.MongoClient = lambda *a, **k: shared
+        patch_mongomock_bulk()
+        count_mongomock_ops()
+
+
+def instrument(scraper, bot):
+    scraper.scrape_page = timed("scrape page", scraper.scrape_page)
+    scraper._crawl_one = timed("detail fetch + parse", scraper._crawl_one)
+    scraper.parse_listing = timed("listing parse", scraper.parse_listing)
+    scraper.link_shortener._fetch_one = timed("shorten (API miss)",
+                                              scraper.link_shortener._fetch_one)
+    scraper.link_shortener.shorten_many = timed("shorten batch",
+                                                scraper.link_shortener.shorten_many)
+    scraper.store_page = timed("store page", scraper.store_page)
+    bot.get_unposted_movies = timed("get_unposted_movies", bot.get_unposted_movies)
+    bot.fetch_image_as_inputfile = timed("image fetch", bot.fetch_image_as_inputfile)
+    bot.send_movie = timed("send_movie", bot.send_movie)
+    bot.send_album = timed("send_album", bot.send_album)
+
+
+async def run(args):
+    site = FixtureSite(args.fixtures, args.movies, args.latency_ms / 1000,
+                       args.flood_every).start()
+    setup_environment(args, site)
+
+    import scraper
+    import bot
+    from aiogram.client.bot import Bot as AiogramBot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    scraper.BASE_URL = site.base + "/page/{}/"
+    bot.bot = AiogramBot(BENCH_TOKEN, session=AiohttpSession(
+        api=TelegramAPIServer.from_base(site.base)))
+    bot.bot.session.middleware(bot.TelegramMetricsMiddleware())
+    instrument(scraper, bot)
+
+    loop = asyncio.get_running_loop()
+    scraped_movies = posted = 0
+    scrape_time = post_time = 0.0
+
+    for page in range(1, args.pages + 1):
+        db_phase[0] = "scrape"
+        started = time.perf_counter()
+        result = await loop.run_in_executor(None, scraper.scrape_page, page)
+        if result:
+            scraper.store_page(result)
+            scraped_movies += len(result["latest_movies"]) + len(result["random_movies"])
+        scrape_time += time.perf_counter() - started
+
+        db_phase[0] = "post"
+        started = time.perf_counter()
+        movies = await bot.get_unposted_movies()
+        if movies:
+            posted += await bot.post_movies(movies)
+        post_time += time.perf_counter() - started
+
+    await bot.close_http_session()
+    await bot.bot.session.close()
+    site.stop()
+
+    if db_errors:
+        # Throughput without those writes would be meaningless
+        print(f"\nBenchmark failed: {len(db_errors)} database errors", file=sys.stderr)
+        for error in db_errors[:20]:
+            print(f"  {error}", file=sys.stderr)
+        sys.exit(1)
+
+    # .get: indexing the defaultdict would add an empty stage to the table below
+    sends = len(stage_latencies.get("send_movie", [])) + len(stage_latencies.get("send_album", []))
+    print("\n================ BENCHMARK ================")
+    print(f"Pages: {args.pages}  Movies scraped: {scraped_movies}  "
+          f"Posted: {posted} ({sends} send attempts, albums count once)")
+    print(f"Scrape: {scrape_time:.2f}s  → {args.pages / scrape_time:.2f} pages/s, "
+          f"{scraped_movies / scrape_time:.2f} movies/s")
+    if post_time and posted:
+        print(f"Post:   {post_time:.2f}s  → {posted / post_time:.2f} posts/s")
+    print(f"DB round trips per movie: scrape {db_ops['scrape'] / max(scraped_movies, 1):.2f}, "
+          f"post {db_ops['post'] / max(posted, 1):.2f}")
+    print(f"Requests: {dict(site.hits)}")
+    print("\nStage latencies (ms)        count     p50     p95     p99     max")
+    for stage, values in stage_latencies.items():
+        ms = [v * 1000 for v in values]
+        print(f"  {stage:<26}{len(ms):>6}{percentile(ms, 50):>8.1f}{percentile(ms, 95):>8.1f}"
+              f"{percentile(ms, 99):>8.1f}{max(ms):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline scrape → store → post benchmark")
+    parser.add_argument("--pages", type=int, default=3, help="listing pages to scrape")
+    parser.add_argument("--movies", type=int, default=24,
+                        help="movies per generated listing page")
+    parser.add_argument("--fixtures", help="directory with saved pages (page_<n>.html, <slug>.html)")
+    parser.add_argument("--latency-ms", type=float, default=20,
+                        help="artificial latency of every fake endpoint")
+    parser.add_argument("--mongo-uri", help="local mongod instead of mongomock")
+    parser.add_argument("--post-rate", type=int, default=6000,
+                        help="POST_RATE_PER_MINUTE for the run (Telegram's real limit is 20)")
+    parser.add_argument("--media-group", action="store_true",
+                        help="post in send_media_group albums (POST_MEDIA_GROUP=1)")
+    parser.add_argument("--flood-every", type=int, default=0,
+                        help="answer every Nth Bot API call with 429 retry_after=1")
+    args = parser.parse_args()
+
+    if args.fixtures and not os.path.isdir(args.fixtures):
+        sys.exit(f"Fixture directory not found: {args.fixtures}")
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
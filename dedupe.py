@@ -0,0 +1,160 @@
+# dedupe.py — Near-duplicate detection (the same film under another link or title)
+#
+# unique_movie_id only catches the exact link. Two more signals:
+#   * title key: the title's words without release noise (year, quality, "Hindi
+#     Dubbed", ...) joined together, plus the year. Same key and compatible
+#     years (equal, or one unknown) = same film.
+#   * perceptual hash: 64-bit dHash of the thumbnail; posters within
+#     DEDUPE_PHASH_DISTANCE bits are the same image, re-encoded or resized.
+#     Needs Pillow (optional); without it only title keys and thumb URLs are used.
+#
+# The scraper drops duplicates before fetching inner pages; the bot checks again
+# before posting, where thumbnails are already downloaded.
+
+import io
+import os
+import re
+import threading
+
+from search import normalize
+
+try:
+    from PIL import Image
+except ImportError:  # optional: pip install Pillow
+    Image = None
+
+# ------------------------------------------------
+# CONFIG
+# ------------------------------------------------
+DEDUPE = os.environ.get("DEDUPE", "1") == "1"
+DEDUPE_PHASH_DISTANCE = int(os.environ.get("DEDUPE_PHASH_DISTANCE", "6"))  # max differing bits
+
+YEAR_RE = re.compile(r"\b(?:19[2-9]\d|20\d\d)\b")
+BRACKETS_RE = re.compile(r"[(\[{][^)\]}]*[)\]}]")
+FULL_MOVIE_RE = re.compile(r"\bfull\s+movie\b", re.IGNORECASE)
+NOISE_WORDS = frozenset(
+    "480p 720p 1080p 2160p 4k hd fhd uhd hdrip webrip web dl webdl bluray brrip dvdrip "
+    "hdtv hdcam camrip predvd x264 x265 hevc 10bit esub esubs msub subs dubbed dual audio "
+    "org uncut unrated extended download watch online".split())
+# Only noise next to "dubbed" / "dual audio" ("Hindi Medium" keeps its "hindi")
+LANGUAGE_WORDS = frozenset(
+    "hindi english tamil telugu malayalam kannada bengali marathi punjabi korean japanese "
+    "chinese".split())
+
+
+# ------------------------------------------------
+# 🔑 SIGNATURES
+# ------------------------------------------------
+def title_key(title):
+    """
+    ("spidermannowayhome", 2021) for "Spider-Man: No Way Home (2021) Hindi Dubbed 720p".
+    Everything after the last year is release info; words are joined so
+    "Spider Man" and "Spiderman" agree. The key is "" when nothing is left.
+    """
+    text = title or ""
+    year = None
+    years = list(YEAR_RE.finditer(text))
+    if years and text[:years[-1].start()].strip(" ([{-:|"):  # "1917" is a title, not a year
+        year = int(years[-1].group())
+        text = text[:years[-1].start()]
+
+    tokens = normalize(FULL_MOVIE_RE.sub(" ", BRACKETS_RE.sub(" ", text)))
+    dubbed = any(t in ("dubbed", "dual", "audio") for t in tokens)
+    tokens = [t for t in tokens
+              if t not in NOISE_WORDS and not (dubbed and t in LANGUAGE_WORDS)]
+    return "".join(tokens), year
+
+
+def dhash(data: bytes):
+    """64-bit difference hash of an image (None without Pillow or for unreadable data)."""
+    if Image is None or not data:
+        return None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.draft("L", (64, 64))  # JPEG: decode at reduced size
+            pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            bits = (bits << 1) | (left > pixels[row * 9 + col + 1])
+    return bits
+
+
+def signature(movie, phash=None) -> dict:
+    """Fields stored on posted records and movie documents for duplicate lookups."""
+    key, year = title_key(movie.get("title"))
+    sig = {"title_key": key, "year": year}
+    if phash is not None:
+        sig["phash"] = f"{phash:016x}"  # hex: Mongo ints are signed 64-bit
+    return sig
+
+
+# ------------------------------------------------
+# 🗂 INDEX
+# ------------------------------------------------
+class DuplicateIndex:
+    """
+    Thread-safe lookup of known films by title key, thumbnail URL and
+    perceptual hash. Hashes are split into 8 bands of 8 bits: two hashes within
+    7 bits share at least one band exactly, so only those are compared.
+    """
+
+    BANDS = 8
+
+    def __init__(self, max_distance=DEDUPE_PHASH_DISTANCE):
+        self.max_distance = max_distance
+        self._by_key = {}  # title_key → [(year, uid)]
+        self._by_thumb = {}  # thumb URL → uid
+        self._hashes = {}  # uid → phash
+        self._by_band = {}  # (band, value) → uids
+        self._lock = threading.Lock()
+
+    def _bands(self, phash):
+        return [(i, (phash >> (8 * i)) & 0xFF) for i in range(self.BANDS)]
+
+    def add(self, uid, title_key="", year=None, thumb=None, phash=None):
+        if isinstance(phash, str):
+            phash = int(phash, 16)
+        with self._lock:
+            if title_key:
+                self._by_key.setdefault(title_key, []).append((year, uid))
+            if thumb and not thumb.startswith("data:"):  # lazy-load placeholders
+                self._by_thumb.setdefault(thumb, uid)
+            if phash is not None and uid not in self._hashes:
+                self._hashes[uid] = phash
+                for band in self._bands(phash):
+                    self._by_band.setdefault(band, []).append(uid)
+
+    def add_movie(self, uid, movie, phash=None):
+        key, year = title_key(movie.get("title"))
+        self.add(uid, key, year, movie.get("thumb"), phash)
+
+    def match(self, uid, title_key="", year=None, thumb=None, phash=None):
+        """uid of a different known film this one duplicates, else None."""
+        with self._lock:
+            for known_year, known_uid in self._by_key.get(title_key, ()) if title_key else ():
+                if known_uid != uid and (year is None or known_year is None or year == known_year):
+                    return known_uid
+
+            known_uid = self._by_thumb.get(thumb) if thumb and not thumb.startswith("data:") else None
+            if known_uid and known_uid != uid:
+                return known_uid
+
+            if phash is None:
+                return None
+            if self.max_distance < self.BANDS:
+                candidates = {u for band in self._bands(phash) for u in self._by_band.get(band, ())}
+            else:
+                candidates = self._hashes.keys()
+            for known_uid in candidates:
+                if known_uid != uid and (self._hashes[known_uid] ^ phash).bit_count() <= self.max_distance:
+                    return known_uid
+        return None
+
+    def match_movie(self, uid, movie, phash=None):
+        key, year = title_key(movie.get("title"))
+        return self.match(uid, key, year, movie.get("thumb"), phash)
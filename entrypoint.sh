@@ -1,11 +1,10 @@
 #!/bin/bash
 set -e  # Exit immediately if a command exits with a non-zero status
 
-# Use PORT from environment, fallback to 8080
-PORT=${PORT:-8080}
+# Shared Prometheus metrics for scraper jobs in a process pool (metrics.py)
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 
-# Start Flask app in background
-gunicorn --bind 0.0.0.0:$PORT app:app &
-
-# Start Telegram bot & scraper
-python main.py
+# Bot, scheduler, scraper and the health/metrics server (PORT, default 8080)
+# all run in one process
+exec python main.py
@@ -1,11 +1,22 @@
+import os
+import time
+import signal
 import asyncio
 import logging
 import pytz
+from aiohttp import web
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
 
 # Import functions and dispatcher from the respective modules
-from bot import start_bot_polling, register_bot_jobs, TZ
-from scraper import scrape_one_page_for_today # Import the scraping function
+from bot import (start_bot_polling, start_bot_webhook, stop_bot_webhook, register_webhook_route,
+                 register_bot_jobs, refresh_catalog, check_webhook, TZ, dp, delivery_state,
+                 BOT_MODE, WEBHOOK_CHECK_SECONDS)
+from db import STORAGE_MODE
+from scraper import scrape_one_page_for_today, backfill_pages # Import the scraping functions
+from metrics import prometheus_payload
 
 # -----------------------------
 # CONFIG
@@ -13,6 +24,14 @@ from scraper import scrape_one_page_for_today # Import the scraping function
 SCRAPE_TIME_HOUR = 11 # IST hour for scraping (e.g., 4:00 PM IST)
 SCRAPE_TIME_MINUTE = 30 # IST minute for scraping (e.g., 4:02 PM IST)
 
+# Scraper jobs never run on the event loop: "thread" or "process" pool
+SCRAPER_EXECUTOR = os.environ.get("SCRAPER_EXECUTOR", "thread")
+SCRAPER_WORKERS = int(os.environ.get("SCRAPER_WORKERS", "1"))
+
+# Health/metrics HTTP server (runs on the same loop as the bot and scheduler)
+PORT = int(os.environ.get("PORT", "8080"))  # Render/Koyeb provide PORT
+POLL_STALE_SECONDS = int(os.environ.get("POLL_STALE_SECONDS", "120"))  # no getUpdates for this long = unhealthy (polling mode)
+
 # -----------------------------
 # Logging Setup
 # -----------------------------
@@ -27,14 +46,204 @@ logger = logging.getLogger("main")
 # -----------------------------
 scheduler = AsyncIOScheduler(timezone=pytz.timezone(TZ))
 
+# -----------------------------
+# Scraper Executor (keeps blocking scrape work off the bot loop)
+# -----------------------------
+if SCRAPER_EXECUTOR == "process":
+    scraper_executor = ProcessPoolExecutor(max_workers=SCRAPER_WORKERS)
+else:
+    scraper_executor = ThreadPoolExecutor(max_workers=SCRAPER_WORKERS,
+                                          thread_name_prefix="scraper")
+
+scraper_job_stats = {
+    "in_flight": 0,        # submitted and not finished yet (queued + running)
+    "runs": 0,
+    "failures": 0,
+    "last_started_at": None,
+    "last_finished_at": None,
+    "last_wait_seconds": None,      # time spent queued in the executor
+    "last_duration_seconds": None,  # time spent actually scraping
+    "last_error": None,
+}
+
+
+def _timed_call(func, *args):
+    """Runs inside the executor; returns (result, start timestamp, duration) for the loop."""
+    started = time.time()
+    result = func(*args)
+    return result, started, time.time() - started
+
+
+def get_scraper_job_stats():
+    """Snapshot of scraper executor state, including current queue depth."""
+    stats = dict(scraper_job_stats)
+    stats["queue_depth"] = max(stats["in_flight"] - SCRAPER_WORKERS, 0)
+    stats["executor"] = SCRAPER_EXECUTOR
+    return stats
+
+
+async def run_in_scraper_executor(func, *args):
+    """Submits a blocking scraper job to the executor and awaits its result on the loop."""
+    loop = asyncio.get_running_loop()
+    submitted = time.time()
+    scraper_job_stats["in_flight"] += 1
+    logger.info(
+        f"Main: Scraper job {func.__name__} submitted (queue depth {get_scraper_job_stats()['queue_depth']})"
+    )
+
+    try:
+        result, started, duration = await loop.run_in_executor(
+            scraper_executor, _timed_call, func, *args)
+        scraper_job_stats["runs"] += 1
+        scraper_job_stats["last_started_at"] = started
+        scraper_job_stats["last_wait_seconds"] = started - submitted
+        scraper_job_stats["last_duration_seconds"] = duration
+        scraper_job_stats["last_error"] = None
+        logger.info(
+            f"Main: Scraper job {func.__name__} finished in {duration:.1f}s (waited {started - submitted:.1f}s)"
+        )
+        # The job may run in another process: pick up what it stored from Mongo
+        await refresh_catalog()
+        return result
+    except Exception as e:
+        scraper_job_stats["failures"] += 1
+        scraper_job_stats["last_error"] = str(e)
+        logger.error(f"Main: Scraper job {func.__name__} failed: {e}")
+    finally:
+        scraper_job_stats["in_flight"] -= 1
+        scraper_job_stats["last_finished_at"] = time.time()
+
+
+# -----------------------------
+# Commands that run scraper work (need the executor above)
+# -----------------------------
+@dp.message(Command("backfill"))
+async def backfill_cmd(message: Message, command: CommandObject):
+    """/backfill <start> <end>: crawl a page range; re-running resumes from checkpoints."""
+    if STORAGE_MODE != "per_movie":
+        # per_page: the bot only posts the newest scraped_data document, the
+        # other backfilled pages would expire unposted but stay checkpointed
+        await message.answer("Backfill needs STORAGE_MODE=per_movie.")
+        return
+    try:
+        start_page, end_page = map(int, (command.args or "").split())
+    except ValueError:
+        await message.answer("Usage: /backfill <start_page> <end_page>")
+        return
+    if start_page < 1 or end_page < start_page:
+        await message.answer("Invalid page range.")
+        return
+
+    await message.answer(f"Backfilling pages {start_page}-{end_page}...")
+    summary = await run_in_scraper_executor(backfill_pages, start_page, end_page)
+    if summary is None:
+        await message.answer("Backfill failed, check logs.")
+        return
+
+    await message.answer(
+        f"Backfill finished: {summary['done']} saved, {summary['skipped']} already done, "
+        f"{summary['failed']} failed"
+        + (f", stopped at empty page {summary['stopped_at']}" if summary["stopped_at"] else "")
+    )
+
+
+# -----------------------------
+# HTTP Server (health check + Prometheus metrics)
+# -----------------------------
+def health_status():
+    """
+    (healthy, details): scheduler running, and updates are being delivered:
+    polling has completed a getUpdates recently, or Telegram's getWebhookInfo
+    (checked every WEBHOOK_CHECK_SECONDS) shows our URL and no delivery error
+    newer than the last update we received.
+    """
+    now = time.time()
+    mode = delivery_state["mode"]
+    last_poll = delivery_state["last_poll_at"] or delivery_state["started_at"]
+    poll_age = now - last_poll if last_poll else None
+    last_webhook = delivery_state["last_webhook_at"]
+
+    checks = {"scheduler": scheduler.running}
+    if mode == "webhook":
+        checked_at = delivery_state["webhook_checked_at"]
+        last_error_at = delivery_state["webhook_last_error_at"]
+        checks["webhook"] = (
+            checked_at is not None and now - checked_at < 3 * WEBHOOK_CHECK_SECONDS
+            and delivery_state["webhook_info_url"] == delivery_state["webhook_url"]
+            # Telegram retries failed deliveries: an error is fine once one got through
+            and (last_error_at is None or last_error_at < (last_webhook or delivery_state["started_at"]))
+        )
+    else:
+        checks["polling"] = poll_age is not None and poll_age < POLL_STALE_SECONDS
+
+    details = {
+        "checks": checks,
+        "mode": mode,
+        "last_poll_seconds_ago": round(poll_age, 1) if mode == "polling" and poll_age is not None else None,
+        "last_webhook_seconds_ago": round(now - last_webhook, 1) if last_webhook else None,
+        "webhook_error": delivery_state["webhook_last_error"] if mode == "webhook" else None,
+        "jobs": len(scheduler.get_jobs()),
+        "scraper": get_scraper_job_stats(),
+    }
+    return all(checks.values()), details
+
+
+async def home_handler(request):
+    return web.Response(text="Bot Worker is running.")
+
+
+async def health_handler(request):
+    healthy, details = health_status()
+    details["status"] = "ok" if healthy else "unhealthy"
+    return web.json_response(details, status=200 if healthy else 503)
+
+
+async def metrics_handler(request):
+    body, content_type = prometheus_payload()
+    # aiohttp wants the charset separately from the content type
+    response = web.Response(body=body)
+    response.headers["Content-Type"] = content_type
+    return response
+
+
+async def start_http_server(webhook=False):
+    """Serves /, /health, /metrics (and the bot webhook) on PORT; returns the runner for cleanup."""
+    app = web.Application()
+    app.router.add_get("/", home_handler)
+    app.router.add_get("/health", health_handler)
+    app.router.add_get("/metrics", metrics_handler)
+    if webhook:
+        register_webhook_route(app)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", PORT).start()
+    logger.info(f"Main: HTTP server listening on :{PORT}")
+    return runner
+
+
+async def wait_for_shutdown():
+    """Blocks until SIGINT/SIGTERM (webhook mode has no polling loop to wait on)."""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+    await stop.wait()
+    logger.info("Main: Shutdown signal received.")
+
+
 def register_all_jobs():
     """Registers jobs from both bot.py and scraper.py."""
     
     # Register Scraper Job
     # Scrape one new page daily at the specified time
     scheduler.add_job(
-        scrape_one_page_for_today, 
-        "cron", 
+        run_in_scraper_executor,
+        "cron",
+        args=[scrape_one_page_for_today],
         hour=SCRAPE_TIME_HOUR, 
         minute=SCRAPE_TIME_MINUTE, 
         timezone=TZ
@@ -59,15 +268,28 @@ async def main():
     # 2. Start the APScheduler
     scheduler.start()
     logger.info("Main: Scheduler started.")
-    
-    # 3. Start the Telegram Bot polling (this is a blocking call until stopped)
+
+    # 3. Health check / metrics (/ webhook) endpoint
+    use_webhook = BOT_MODE == "webhook"
+    http_runner = await start_http_server(webhook=use_webhook)
+
+    # 4. Receive updates via webhook, or fall back to polling (blocking until stopped)
     try:
-        await start_bot_polling()
+        if use_webhook and await start_bot_webhook():
+            scheduler.add_job(check_webhook, "interval", seconds=WEBHOOK_CHECK_SECONDS)
+            try:
+                await wait_for_shutdown()
+            finally:
+                await stop_bot_webhook()
+        else:
+            await start_bot_polling()
     finally:
+        await http_runner.cleanup()
         # Stop the scheduler when the bot polling stops (e.g., on KeyboardInterrupt)
         if scheduler.running:
             scheduler.shutdown()
             logger.info("Main: Scheduler shut down.")
+        scraper_executor.shutdown(wait=False)
         
     logger.info("Main: Application finished.")
 
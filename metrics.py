@@ -0,0 +1,154 @@
+# metrics.py — Per-stage latency timers and counters
+#
+# Stages: page_fetch, detail_fetch, parse, shorten, mongo, image_fetch, telegram_send, search.
+# Every observation goes to a Prometheus histogram (GET /metrics, served by main.py)
+# and to a small in-process window of recent samples (the /metrics bot command).
+#
+# With SCRAPER_EXECUTOR=process scraper jobs record in child processes. When
+# PROMETHEUS_MULTIPROC_DIR is set (entrypoint.sh does it) every process writes
+# to that directory and /metrics serves the aggregated values.
+
+import os
+import time
+import asyncio
+import threading
+from collections import defaultdict, deque
+from functools import wraps
+
+from prometheus_client import (Counter, Histogram, CollectorRegistry, REGISTRY,
+                               generate_latest, CONTENT_TYPE_LATEST)
+
+# ------------------------------------------------
+# CONFIG
+# ------------------------------------------------
+METRICS_WINDOW = int(os.environ.get("METRICS_WINDOW", "500"))  # recent samples per stage
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Site pages and Telegram uploads take seconds, Mongo/parse milliseconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram("uiiu_stage_seconds", "Latency of one pipeline stage call",
+                          ["stage"], buckets=LATENCY_BUCKETS)
+STAGE_ERRORS = Counter("uiiu_stage_errors_total", "Failed pipeline stage calls", ["stage"])
+EVENTS = Counter("uiiu_events_total", "Pipeline events (posts, flood waits, ...)", ["event"])
+
+# ------------------------------------------------
+# 📈 IN-PROCESS WINDOW (for the bot command)
+# ------------------------------------------------
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=METRICS_WINDOW))
+_totals = defaultdict(lambda: {"count": 0, "errors": 0, "seconds": 0.0})
+_events = defaultdict(int)
+
+
+def observe(stage, seconds, ok=True):
+    """Records one call of `stage` that took `seconds`."""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    if not ok:
+        STAGE_ERRORS.labels(stage).inc()
+    with _lock:
+        _samples[stage].append(seconds)
+        totals = _totals[stage]
+        totals["count"] += 1
+        totals["seconds"] += seconds
+        if not ok:
+            totals["errors"] += 1
+
+
+def inc(event, amount=1):
+    """Counts a pipeline event (e.g. "posted", "flood_wait")."""
+    EVENTS.labels(event).inc(amount)
+    with _lock:
+        _events[event] += amount
+
+
+class track:
+    """
+    Times a block or a function as one call of `stage`; exceptions count as errors.
+
+        with track("page_fetch"): ...
+        async with track("detail_fetch"): ...
+        @track("parse")
+        def parse(...): ...
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.ok = True
+
+    def fail(self):
+        """Marks the current call as failed without raising."""
+        self.ok = False
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is asyncio.CancelledError:
+            return False  # abandoned (e.g. the losing hedged request), not a real call
+        observe(self.stage, time.perf_counter() - self.started, self.ok and exc_type is None)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def __call__(self, func):
+        stage = self.stage
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with track(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def _percentile(ordered, pct):
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summary():
+    """{stage: {count, errors, avg, p50, p95, max}} over the recent window (seconds)."""
+    with _lock:
+        snapshot = {stage: (sorted(_samples[stage]), dict(_totals[stage])) for stage in _totals}
+
+    result = {}
+    for stage, (ordered, totals) in sorted(snapshot.items()):
+        result[stage] = {
+            "count": totals["count"],
+            "errors": totals["errors"],
+            "avg": totals["seconds"] / totals["count"] if totals["count"] else 0.0,
+            "p50": _percentile(ordered, 50) if ordered else 0.0,
+            "p95": _percentile(ordered, 95) if ordered else 0.0,
+            "max": ordered[-1] if ordered else 0.0,
+        }
+    return result
+
+
+def events():
+    with _lock:
+        return dict(_events)
+
+
+# ------------------------------------------------
+# 🌐 PROMETHEUS EXPOSITION (used by main.py)
+# ------------------------------------------------
+def prometheus_payload():
+    """Returns (body, content_type) in the Prometheus text format."""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,264 @@
+# parsers.py — HTML extraction for uiiumovie listing and inner pages
+#
+# Backends (HTML_PARSER): "html.parser" (default), "lxml", "selectolax".
+# The BeautifulSoup backends only build the subtrees the extractors read
+# (PARSE_SCOPED=1), which skips most of the page. All backends return the
+# same dicts as the original full-tree BeautifulSoup code (tests/test_parsers.py).
+
+import os
+
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+
+from metrics import track
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:  # optional: pip install selectolax
+    SelectolaxParser = None
+
+# ------------------------------------------------
+# CONFIG
+# ------------------------------------------------
+HTML_PARSER = os.environ.get("HTML_PARSER", "html.parser")
+PARSE_SCOPED = os.environ.get("PARSE_SCOPED", "1") == "1"
+
+
+def resolve_backend(name):
+    """Falls back to html.parser when the requested backend isn't installed."""
+    if name == "selectolax" and SelectolaxParser is not None:
+        return name
+    if name == "lxml" and builder_registry.lookup("lxml") is not None:
+        return name
+    if name != "html.parser":
+        print(f"Parser: Backend '{name}' not available, using html.parser")
+    return "html.parser"
+
+
+BACKEND = resolve_backend(HTML_PARSER)
+
+
+# ------------------------------------------------
+# 🎯 SCOPED PARSING (SoupStrainer)
+# ------------------------------------------------
+def _classes(attrs):
+    value = attrs.get("class") or ""
+    return value if isinstance(value, list) else value.split()
+
+
+class TagStrainer(SoupStrainer):
+    """parse_only filter that keeps only the subtrees whose root matches `predicate(name, attrs)`."""
+
+    def __init__(self, predicate):
+        # bs4 < 4.13 calls a callable name rule with (name, attrs)
+        super().__init__(lambda name, attrs=None: predicate(name, attrs or {}))
+        self.predicate = predicate
+
+    # bs4 >= 4.13
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        return self.predicate(name, attrs or {})
+
+    def allow_string_creation(self, string):
+        return False
+
+
+def _is_detail_tag(name, attrs):
+    return ((name == "div" and attrs.get("id") == "download")
+            or (name == "span" and "runtime" in _classes(attrs)))
+
+
+def _is_listing_tag(name, attrs):
+    return (name == "h3"
+            or (name == "div" and "grid-container" in _classes(attrs))
+            or (name == "div" and attrs.get("id") == "gmr-main-load"))
+
+
+DETAIL_STRAINER = TagStrainer(_is_detail_tag)
+LISTING_STRAINER = TagStrainer(_is_listing_tag)
+
+
+def make_soup(html, strainer=None, backend=None):
+    return BeautifulSoup(html, backend or BACKEND, parse_only=strainer if PARSE_SCOPED else None)
+
+
+# ------------------------------------------------
+# BeautifulSoup extractors (html.parser / lxml)
+# ------------------------------------------------
+def _soup_movie_details(html, backend):
+    soup = make_soup(html, DETAIL_STRAINER, backend)
+
+    movie_info = {
+        "download_links": [],
+        "duration": None
+    }
+
+    # ⭐ DOWNLOAD LINKS
+    try:
+        dl_section = soup.find("div", id="download")
+        if dl_section:
+            for a in dl_section.find_all("a", href=True):
+                movie_info["download_links"].append({
+                    "quality": a.get_text(strip=True),
+                    "url": a["href"]
+                })
+    except:
+        pass
+
+    # ⭐ DURATION
+    try:
+        dur = soup.find("span", class_="runtime")
+        if dur:
+            movie_info["duration"] = dur.get_text(strip=True)
+    except:
+        pass
+
+    return movie_info
+
+
+def _soup_listing(html, backend):
+    soup = make_soup(html, LISTING_STRAINER, backend)
+    listing = {"random_movies": [], "latest_movies": []}
+
+    # RANDOM MOVIES
+    random_section = soup.find("h3", text="Random Movie")
+    if random_section:
+        grid = random_section.find_next("div", class_="grid-container")
+        if grid:
+            for item in grid.find_all("div", class_="gmr-item-modulepost"):
+                a_tag = item.find("a")
+                img = item.find("img")
+
+                if a_tag and img:
+                    listing["random_movies"].append({
+                        "title": img.get("alt"),
+                        "thumb": img.get("src"),
+                        "link": a_tag.get("href")
+                    })
+
+    # LATEST MOVIES
+    latest_section = soup.find("h3", text="Latest Movie")
+    if latest_section:
+        main_section = latest_section.find_next("div", id="gmr-main-load")
+        if main_section:
+            for post in main_section.find_all("article"):
+                a_tag = post.find("a", itemprop="url")
+                img = post.find("img")
+
+                if a_tag and img:
+                    listing["latest_movies"].append({
+                        "title": img.get("alt"),
+                        "thumb": img.get("src"),
+                        "link": a_tag.get("href")
+                    })
+
+    return listing
+
+
+# ------------------------------------------------
+# selectolax extractors (lexbor, CSS selectors)
+# ------------------------------------------------
+def _lax_text(node):
+    # Same as bs4 get_text(strip=True): strip every text node, join with ""
+    return node.text(deep=True, separator="", strip=True)
+
+
+def _lax_movie_details(html):
+    tree = SelectolaxParser(html)
+    movie_info = {
+        "download_links": [],
+        "duration": None
+    }
+
+    dl_section = tree.css_first("div#download")
+    if dl_section:
+        for a in dl_section.css("a[href]"):
+            movie_info["download_links"].append({
+                "quality": _lax_text(a),
+                "url": a.attributes.get("href")
+            })
+
+    dur = tree.css_first("span.runtime")
+    if dur:
+        movie_info["duration"] = _lax_text(dur)
+
+    return movie_info
+
+
+def _lax_next_after(nodes, start, selector_match):
+    """First node after `start` in document order that satisfies `selector_match`."""
+    seen = False
+    for node in nodes:
+        if seen and selector_match(node):
+            return node
+        if node.mem_id == start.mem_id:
+            seen = True
+    return None
+
+
+def _lax_listing(html):
+    tree = SelectolaxParser(html)
+    listing = {"random_movies": [], "latest_movies": []}
+
+    # Document-ordered candidates, the equivalent of bs4's find / find_next
+    nodes = tree.css("h3, div.grid-container, div#gmr-main-load")
+
+    def heading(text):
+        for node in nodes:
+            if node.tag == "h3" and node.text(deep=True) == text:
+                return node
+        return None
+
+    random_section = heading("Random Movie")
+    if random_section:
+        grid = _lax_next_after(nodes, random_section,
+                               lambda n: n.tag == "div" and "grid-container" in (n.attributes.get("class") or "").split())
+        if grid:
+            for item in grid.css("div.gmr-item-modulepost"):
+                a_tag = item.css_first("a")
+                img = item.css_first("img")
+
+                if a_tag and img:
+                    listing["random_movies"].append({
+                        "title": img.attributes.get("alt"),
+                        "thumb": img.attributes.get("src"),
+                        "link": a_tag.attributes.get("href")
+                    })
+
+    latest_section = heading("Latest Movie")
+    if latest_section:
+        main_section = _lax_next_after(nodes, latest_section,
+                                       lambda n: n.tag == "div" and n.attributes.get("id") == "gmr-main-load")
+        if main_section:
+            for post in main_section.css("article"):
+                a_tag = post.css_first('a[itemprop="url"]')
+                img = post.css_first("img")
+
+                if a_tag and img:
+                    listing["latest_movies"].append({
+                        "title": img.attributes.get("alt"),
+                        "thumb": img.attributes.get("src"),
+                        "link": a_tag.attributes.get("href")
+                    })
+
+    return listing
+
+
+# ------------------------------------------------
+# PUBLIC API
+# ------------------------------------------------
+@track("parse")
+def parse_movie_details(html, backend=None):
+    """Inner page → {"download_links": [{"quality", "url"}], "duration"} (original URLs)."""
+    backend = resolve_backend(backend) if backend else BACKEND
+    if backend == "selectolax":
+        return _lax_movie_details(html)
+    return _soup_movie_details(html, backend)
+
+
+@track("parse")
+def parse_listing(html, backend=None):
+    """Listing page → {"random_movies": [...], "latest_movies": [...]} with title/thumb/link."""
+    backend = resolve_backend(backend) if backend else BACKEND
+    if backend == "selectolax":
+        return _lax_listing(html)
+    return _soup_listing(html, backend)
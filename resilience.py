@@ -0,0 +1,193 @@
+# resilience.py — Circuit breakers and jittered retries for flaky dependencies
+#
+# A breaker opens after `failure_threshold` consecutive failures (anything but
+# a success or an HTTP 4xx, which proves the dependency is up; 401/403 still
+# count, a rejected key never starts working) and rejects calls for
+# `reset_timeout` seconds; after that a single half-open probe decides whether
+# it closes again. Only transient failures are retried, with full jitter, and
+# every attempt's timeout is capped at what is left of the time budget.
+
+import time
+import random
+import asyncio
+import threading
+
+import aiohttp
+import requests
+
+import metrics
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+def is_transient(e: Exception) -> bool:
+    """Timeouts, connection errors, 5xx and 429 are worth retrying; 4xx are not."""
+    if isinstance(e, requests.HTTPError):
+        status = e.response.status_code if e.response is not None else 0
+        return status >= 500 or status == 429
+    if isinstance(e, aiohttp.ClientResponseError):
+        return e.status >= 500 or e.status == 429
+    return isinstance(e, (requests.ConnectionError, requests.Timeout,
+                          aiohttp.ClientError, asyncio.TimeoutError))
+
+
+def is_client_error(e: Exception) -> bool:
+    """
+    A real HTTP 4xx: the dependency is up, the request itself was bad.
+    Not 429 (overloaded) and not 401/403 (bad credentials fail every request).
+    """
+    if isinstance(e, requests.HTTPError):
+        status = e.response.status_code if e.response is not None else 0
+    elif isinstance(e, aiohttp.ClientResponseError):
+        status = e.status
+    else:
+        return False
+    return 400 <= status < 500 and status not in (401, 403, 429)
+
+
+# ------------------------------------------------
+# ⚡ CIRCUIT BREAKER
+# ------------------------------------------------
+class CircuitBreaker:
+    """Thread-safe breaker (scraper jobs run in executor threads, each with its own loop)."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """True unless open and still cooling down (does not take the half-open probe)."""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self.opened_at >= self.reset_timeout
+            return self.state == self.CLOSED or not self._probing
+
+    def allow(self) -> bool:
+        """True if a call may go out now (closed, or the single half-open probe)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release_probe(self):
+        """An attempt was abandoned (e.g. a cancelled hedge): let another probe through."""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print(f"Breaker: {self.name} closed again")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED
+                                                and self.failures >= self.failure_threshold):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+                print(f"Breaker: {self.name} opened after {self.failures} failures "
+                      f"(retry in {self.reset_timeout:.0f}s)")
+                metrics.inc(f"breaker_open:{self.name}")
+
+
+# ------------------------------------------------
+# 🔁 JITTERED RETRY WITH TIME BUDGET
+# ------------------------------------------------
+def _next_delay(attempt, base_delay, max_delay):
+    # "Full jitter": uniform in [0, min(max, base * 2^attempt)]
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def _settle(breaker, e, attempt, retries, deadline, base_delay, max_delay):
+    """Records a failed attempt; returns the delay before the next one, or None to give up."""
+    if is_client_error(e):
+        breaker.record_success()  # the dependency answered, the request itself was bad
+        return None
+    # Anything else (e.g. an HTML error page where JSON was expected) means the
+    # dependency is degraded, but only transient errors are worth retrying
+    breaker.record_failure()
+    if not is_transient(e):
+        return None
+    delay = _next_delay(attempt, base_delay, max_delay)
+    if attempt >= retries or time.monotonic() + delay >= deadline:
+        return None
+    return delay
+
+
+def call_with_retry(func, *args, breaker, retries=2, budget=30.0, timeout=None,
+                    base_delay=0.5, max_delay=5.0, **kwargs):
+    """
+    Calls func(*args, **kwargs) through `breaker`, retrying transient failures
+    up to `retries` times within `budget` seconds. With a per-attempt `timeout`,
+    func also gets timeout=min(timeout, remaining budget). Raises
+    CircuitOpenError when the breaker is open, otherwise the last exception.
+    """
+    deadline = time.monotonic() + budget
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"{breaker.name} circuit open")
+        if timeout is not None:
+            kwargs["timeout"] = max(min(timeout, deadline - time.monotonic()), 0.001)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            delay = _settle(breaker, e, attempt, retries, deadline, base_delay, max_delay)
+            if delay is None:
+                raise
+            attempt += 1
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
+
+
+async def acall_with_retry(func, *args, breaker, retries=2, budget=30.0,
+                           base_delay=0.5, max_delay=5.0, **kwargs):
+    """
+    Coroutine version of call_with_retry (`func` is an async function).
+    Each attempt is cancelled once the budget runs out (an asyncio.TimeoutError).
+    """
+    deadline = time.monotonic() + budget
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"{breaker.name} circuit open")
+        try:
+            result = await asyncio.wait_for(func(*args, **kwargs),
+                                            max(deadline - time.monotonic(), 0.001))
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            delay = _settle(breaker, e, attempt, retries, deadline, base_delay, max_delay)
+            if delay is None:
+                raise
+            attempt += 1
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
@@ -0,0 +1,241 @@
+# search.py — In-memory title search over the scraped and posted catalog
+#
+# Titles are normalized into word tokens. Each query word is compared with the
+# best-matching title word (trigram Dice similarity, 1.0 for a prefix), like
+# pg_trgm's word_similarity, and a title scores the mean over the query words.
+# Years and quality words in a title don't dilute the match, so typos
+# ("jawn" → "Jawan (2023) Hindi 720p") and partial words still match. The index is
+# built once from MongoDB at startup and then caught up incrementally
+# (documents newer than the last _id seen), so queries never touch Atlas.
+
+import os
+import re
+import heapq
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import Counter, OrderedDict, defaultdict
+from datetime import timedelta
+from operator import itemgetter
+
+from bson import ObjectId
+
+from db import (adata_col, ameta_col, amovies_col, STORAGE_MODE, LISTING_PROJECTION,
+                unique_movie_id)
+from metrics import track
+
+# ------------------------------------------------
+# CONFIG
+# ------------------------------------------------
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "256"))  # cached ranked queries
+SEARCH_MIN_SIMILARITY = float(os.environ.get("SEARCH_MIN_SIMILARITY", "0.5"))  # mean over query words
+SEARCH_MIN_WORD_SIMILARITY = float(os.environ.get("SEARCH_MIN_WORD_SIMILARITY", "0.4"))  # one word pair
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", "200"))  # per query, all pages
+
+logger = logging.getLogger("search")
+
+
+# ------------------------------------------------
+# 🔤 NORMALIZATION
+# ------------------------------------------------
+def normalize(text) -> list:
+    """Lowercase word tokens with accents stripped ("Amélie (2001)" → ["amelie", "2001"])."""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"[^\W_]+", text.casefold())
+
+
+def trigrams(tokens) -> set:
+    """Padded character trigrams of every token, as in pg_trgm ("ab" → "  a", " ab", "ab ")."""
+    grams = set()
+    for token in tokens:
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def query_id(query) -> str:
+    """Short stable id of a normalized query (fits in Telegram callback data)."""
+    return hashlib.sha1(" ".join(normalize(query)).encode()).hexdigest()[:12]
+
+
+# ------------------------------------------------
+# 🗂 INDEX
+# ------------------------------------------------
+class SearchIndex:
+    """
+    Thread-safe title index: uid → entry, title word → uids, and a trigram
+    index over the word vocabulary (far smaller than the titles).
+    Ranked results are cached per normalized query (LRU) until the index changes.
+    """
+
+    def __init__(self, cache_size=SEARCH_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.entries = {}  # uid → {"uid", "title", "link", "thumb", "posted"}
+        self._tokens = {}  # uid → title tokens
+        self._by_token = defaultdict(set)  # title word → uids
+        self._word_grams = {}  # vocabulary word → its trigrams
+        self._by_gram = defaultdict(set)  # trigram → vocabulary words
+        self._cache = OrderedDict()  # normalized query → ranked uids
+        self._queries = OrderedDict()  # query_id → query (for paging callbacks)
+        self._high_water = {}  # collection → last _id loaded
+        self._lock = threading.Lock()
+        self.stats = {"queries": 0, "cache_hits": 0}
+
+    def __len__(self):
+        return len(self.entries)
+
+    # --- updates ---
+    def _add(self, movie, uid, posted):
+        title = movie.get("title") or ""
+        entry = self.entries.get(uid)
+        if entry is None:
+            entry = self.entries[uid] = {"uid": uid, "posted": False}
+        elif entry["title"] == title:
+            entry["posted"] = entry["posted"] or posted
+            return False
+
+        for token in self._tokens.get(uid, ()):
+            self._by_token[token].discard(uid)
+        tokens = normalize(title)
+        for token in tokens:
+            self._by_token[token].add(uid)
+            if token not in self._word_grams:
+                self._word_grams[token] = trigrams([token])
+                for gram in self._word_grams[token]:
+                    self._by_gram[gram].add(token)
+        self._tokens[uid] = tokens
+
+        entry.update(title=title, link=movie.get("link"), thumb=movie.get("thumb"))
+        entry["posted"] = entry["posted"] or posted  # posted never goes back
+        return True
+
+    def add_many(self, movies, posted=False):
+        """Indexes (or re-indexes renamed) movies; returns how many titles changed."""
+        changed = 0
+        with self._lock:
+            for movie in movies:
+                uid = movie.get("uid") or movie.get("posted_uid") or unique_movie_id(movie)
+                changed += self._add(movie, uid, posted or bool(movie.get("posted")))
+            if changed:
+                self._cache.clear()
+        return changed
+
+    def mark_posted(self, uid):
+        with self._lock:
+            if uid in self.entries:
+                self.entries[uid]["posted"] = True
+
+    # --- queries ---
+    def _similar_words(self, query_token):
+        """{vocabulary word: similarity} for words close to `query_token`."""
+        grams = trigrams([query_token])
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._by_gram.get(gram, ()))
+
+        words = {}
+        for word, common in shared.items():
+            dice = 2 * common / (len(grams) + len(self._word_grams[word]))
+            if word.startswith(query_token):
+                dice = max(dice, 0.9)  # partial word; only the exact word scores 1.0
+            if dice >= SEARCH_MIN_WORD_SIMILARITY:
+                words[word] = dice
+        return words
+
+    def _rank(self, tokens):
+        # Per title: sum over query words of the best-matching title word
+        scores = defaultdict(float)
+        for query_token in tokens:
+            best = {}
+            for word, similarity in self._similar_words(query_token).items():
+                for uid in self._by_token.get(word, ()):
+                    if similarity > best.get(uid, 0.0):
+                        best[uid] = similarity
+            for uid, similarity in best.items():
+                scores[uid] += similarity
+
+        minimum = SEARCH_MIN_SIMILARITY * len(tokens)
+        matches = (item for item in scores.items() if item[1] >= minimum)
+        # Only the kept results are ordered; ties: shorter titles (fewer unmatched
+        # words) first, then alphabetical
+        best = heapq.nlargest(SEARCH_MAX_RESULTS, matches, key=itemgetter(1))
+        best.sort(key=lambda s: (-s[1], len(self._tokens[s[0]]), self.entries[s[0]]["title"]))
+        return [uid for uid, _ in best]
+
+    @track("search")
+    def search(self, query) -> list:
+        """Ranked entries for `query` (best first); served from the LRU when repeated."""
+        tokens = normalize(query)
+        if not tokens:
+            return []
+        key = " ".join(tokens)
+
+        with self._lock:
+            self.stats["queries"] += 1
+            qid = query_id(query)
+            self._queries[qid] = query
+            self._queries.move_to_end(qid)
+            while len(self._queries) > self.cache_size:
+                self._queries.popitem(last=False)
+
+            uids = self._cache.get(key)
+            if uids is not None:
+                self.stats["cache_hits"] += 1
+                self._cache.move_to_end(key)
+            else:
+                uids = self._rank(tokens)
+                self._cache[key] = uids
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return [dict(self.entries[uid]) for uid in uids]
+
+    def page(self, query, offset=0, limit=10):
+        """(entries[offset:offset + limit], total matches)."""
+        results = self.search(query)
+        return results[offset:offset + limit], len(results)
+
+    def query_for(self, qid):
+        """Original query text of a recent query_id, or None once it left the LRU."""
+        with self._lock:
+            return self._queries.get(qid)
+
+    # --- loading from MongoDB ---
+    async def _load_new(self, name, collection, query, projection):
+        """Documents of `collection` added since the last refresh, oldest first."""
+        last = self._high_water.get(name)
+        if last is not None:
+            # ObjectIds from different processes are only ordered to the second:
+            # re-read that second too (re-adding is a no-op)
+            since = ObjectId.from_datetime(last.generation_time - timedelta(seconds=1))
+            query = dict(query, _id={"$gte": since})
+        docs = await collection.find(query, projection, sort=[("_id", 1)])
+        if docs:
+            self._high_water[name] = docs[-1]["_id"]
+        return docs
+
+    async def refresh(self):
+        """Loads everything scraped or posted since the last call (all of it on the first)."""
+        added = 0
+        if STORAGE_MODE == "per_movie":
+            docs = await self._load_new("movies", amovies_col, {},
+                                        {"uid": 1, "title": 1, "link": 1, "thumb": 1, "posted": 1})
+            added += self.add_many(docs)
+        else:
+            docs = await self._load_new("scraped_data", adata_col, {}, LISTING_PROJECTION)
+            for doc in docs:
+                added += self.add_many((doc.get("latest_movies", []) or [])
+                                       + (doc.get("random_movies", []) or []))
+
+        # Posted records keep titles whose page documents already expired
+        docs = await self._load_new("posted", ameta_col, {"posted_uid": {"$exists": True}},
+                                    {"posted_uid": 1, "title": 1, "link": 1, "thumb": 1})
+        added += self.add_many(docs, posted=True)
+
+        if added:
+            logger.info(f"Search: Indexed {added} titles ({len(self)} in catalog).")
+        return added
+
+
+catalog = SearchIndex()
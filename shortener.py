@@ -0,0 +1,353 @@
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+
+import aiohttp
+import requests
+from pymongo import UpdateOne
+
+from db import run_db
+from metrics import track
+from resilience import CircuitBreaker, CircuitOpenError, acall_with_retry
+
+# ------------------------------------------------
+# CONFIG
+# ------------------------------------------------
+# Point SHORTENER_API_URL at a local stub server to test without arolinks.com
+SHORTENER_API_URL = os.environ.get("SHORTENER_API_URL", "https://arolinks.com/api")
+SHORTENER_API_KEY = os.environ.get("SHORTENER_API_KEY",
+                                   "180027087e13f4a147d7615e8ac5a8d93240050c")
+SHORTENER_TIMEOUT = int(os.environ.get("SHORTENER_TIMEOUT", "10"))
+SHORTENER_CONCURRENCY = int(os.environ.get("SHORTENER_CONCURRENCY", "5"))  # misses in flight
+SHORTENER_LRU_SIZE = int(os.environ.get("SHORTENER_LRU_SIZE", "5000"))
+
+# Several providers (JSON list), e.g.
+#   [{"name": "arolinks", "url": "https://arolinks.com/api", "key": "..."},
+#    {"name": "backup", "url": "https://other.example/api", "key": "..."}]
+# Unset: a single provider from SHORTENER_API_URL / SHORTENER_API_KEY
+SHORTENER_PROVIDERS = os.environ.get("SHORTENER_PROVIDERS")
+
+# Routing: fastest healthy provider by latency/error EWMA; a second (hedged)
+# request goes to the next provider when the first is slower than its p95
+SHORTENER_EWMA_ALPHA = 0.2
+SHORTENER_HEDGE_AFTER = float(os.environ.get("SHORTENER_HEDGE_AFTER", "1.5"))  # seconds, until p95 is known
+SHORTENER_HEDGE_MIN = 0.05  # never hedge sooner than this
+
+# While every provider's breaker is open, links are returned unshortened right away
+SHORTENER_BREAKER_THRESHOLD = int(os.environ.get("SHORTENER_BREAKER_THRESHOLD", "5"))
+SHORTENER_BREAKER_RESET = int(os.environ.get("SHORTENER_BREAKER_RESET", "60"))
+SHORTENER_RETRIES = int(os.environ.get("SHORTENER_RETRIES", "1"))
+SHORTENER_RETRY_BUDGET = int(os.environ.get("SHORTENER_RETRY_BUDGET", "15"))
+
+
+# ------------------------------------------------
+# 🧠 IN-PROCESS LRU
+# ------------------------------------------------
+class LRUCache:
+    """Small thread-safe LRU (scraper jobs run in executor threads)."""
+
+    def __init__(self, maxsize=SHORTENER_LRU_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# ------------------------------------------------
+# 🌍 PROVIDERS
+# ------------------------------------------------
+class ShortenerRejected(Exception):
+    """A provider answered without a short URL (e.g. status=error for a bad key or quota)."""
+
+
+class ShortenerProvider:
+    """
+    One shortener API with its own breaker and latency/error EWMA.
+    The default request/response format is the AdLinkFly one arolinks uses;
+    subclass and override request_url / parse_response for other APIs.
+    """
+
+    def __init__(self, name, api_url, api_key):
+        self.name = name
+        self.api_url = api_url
+        self.api_key = api_key
+        self.breaker = CircuitBreaker(f"shortener:{name}", SHORTENER_BREAKER_THRESHOLD,
+                                      SHORTENER_BREAKER_RESET)
+        self.ewma_latency = None  # seconds; None until the first answer
+        self.ewma_error = 0.0
+        self.latencies = deque(maxlen=100)  # for the hedge threshold (p95)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def request_url(self, long_url):
+        # URL ENCODE REQUIRED
+        encoded = requests.utils.quote(long_url, safe='')
+        return f"{self.api_url}?api={self.api_key}&url={encoded}&format=json"
+
+    @staticmethod
+    def parse_response(data):
+        # Expected format:
+        # {"status":"success","shortenedUrl":"https:\/\/arolinks.com\/xxxxx"}
+        if data.get("status") == "success" and data.get("shortenedUrl"):
+            return data["shortenedUrl"]
+        return None
+
+    def parse_or_raise(self, data):
+        """parse_response, raising ShortenerRejected so the breaker counts a failure."""
+        short = self.parse_response(data)
+        if not short:
+            raise ShortenerRejected(f"{self.name} returned no short URL: {str(data)[:200]}")
+        return short
+
+    def record(self, seconds, ok):
+        alpha = SHORTENER_EWMA_ALPHA
+        with self._lock:
+            self.calls += 1
+            self.ewma_error = alpha * (0.0 if ok else 1.0) + (1 - alpha) * self.ewma_error
+            if ok:
+                self.latencies.append(seconds)
+                self.ewma_latency = (seconds if self.ewma_latency is None
+                                     else alpha * seconds + (1 - alpha) * self.ewma_latency)
+
+    def score(self):
+        """
+        Lower is better. Untried providers score 0 so they get a first request;
+        one that has never answered is charged the full timeout per call.
+        """
+        if self.calls == 0:
+            return 0.0
+        latency = self.ewma_latency if self.ewma_latency is not None else SHORTENER_TIMEOUT
+        return latency * (1 + 10 * self.ewma_error)
+
+    def hedge_delay(self):
+        """p95 of recent latencies (SHORTENER_HEDGE_AFTER until 20 samples exist)."""
+        with self._lock:
+            if len(self.latencies) < 20:
+                return SHORTENER_HEDGE_AFTER
+            ordered = sorted(self.latencies)
+        return max(ordered[int(0.95 * (len(ordered) - 1))], SHORTENER_HEDGE_MIN)
+
+
+def providers_from_env(api_url=None, api_key=None):
+    if SHORTENER_PROVIDERS and not api_url:
+        return [ShortenerProvider(p["name"], p["url"], p.get("key", ""))
+                for p in json.loads(SHORTENER_PROVIDERS)]
+    return [ShortenerProvider("default", api_url or SHORTENER_API_URL,
+                              api_key or SHORTENER_API_KEY)]
+
+
+# ------------------------------------------------
+# 🔗 LINK SHORTENER (LRU → Mongo → API)
+# ------------------------------------------------
+class LinkShortener:
+    """
+    Long → short URL resolution with two cache layers:
+    an in-process LRU and a persistent Mongo collection.
+    Only cache misses reach a shortener API, routed to the fastest healthy
+    provider and hedged to the next one when it is slow.
+    """
+
+    def __init__(self, collection=None, api_url=None, api_key=None, providers=None,
+                 concurrency=None, timeout=None, lru_size=None):
+        self.collection = collection
+        self.providers = providers or providers_from_env(api_url, api_key)
+        self.concurrency = concurrency or SHORTENER_CONCURRENCY
+        self.timeout = timeout or SHORTENER_TIMEOUT
+        self.lru = LRUCache(lru_size or SHORTENER_LRU_SIZE)
+        self.stats = {"lru_hits": 0, "db_hits": 0, "api_calls": 0, "coalesced": 0,
+                      "short_circuited": 0, "hedged": 0, "hedge_wins": 0}
+
+        if self.collection is not None:
+            try:
+                self.collection.create_index([("long_url", 1)], unique=True)
+            except Exception as e:
+                print(f"Shortener: Cache index setup failed: {e}")
+
+    # ---------- helpers ----------
+    def ranked_providers(self):
+        """Healthy providers (breaker not open), fastest first."""
+        healthy = [p for p in self.providers if p.breaker.available()]
+        return sorted(healthy, key=lambda p: p.score())
+
+    def _retries(self):
+        # With several providers, failing over to the next one is the retry
+        return SHORTENER_RETRIES if len(self.providers) == 1 else 0
+
+    def _db_lookup(self, long_urls):
+        if self.collection is None or not long_urls:
+            return {}
+        try:
+            cursor = self.collection.find({"long_url": {"$in": list(long_urls)}},
+                                          {"_id": 0, "long_url": 1, "short_url": 1})
+            return {d["long_url"]: d["short_url"] for d in cursor}
+        except Exception as e:
+            print(f"Shortener: Cache lookup failed: {e}")
+            return {}
+
+    def _db_store(self, mapping):
+        if self.collection is None or not mapping:
+            return
+        now = datetime.utcnow()
+        try:
+            self.collection.bulk_write([
+                UpdateOne({"long_url": long_url},
+                          {"$set": {"short_url": short_url},
+                           "$setOnInsert": {"created_at": now}},
+                          upsert=True)
+                for long_url, short_url in mapping.items()
+            ], ordered=False)
+        except Exception as e:
+            print(f"Shortener: Cache store failed: {e}")
+
+    # ---------- batched async API ----------
+    async def _call_provider(self, provider, session, long_url):
+        """One provider request through its breaker; None on any failure."""
+        async def attempt():
+            self.stats["api_calls"] += 1
+            async with track("shorten"):
+                async with session.get(provider.request_url(long_url)) as resp:
+                    resp.raise_for_status()
+                    data = await resp.json(content_type=None)
+                return provider.parse_or_raise(data)
+
+        started = time.perf_counter()
+        try:
+            short = await acall_with_retry(attempt, breaker=provider.breaker,
+                                           retries=self._retries(),
+                                           budget=SHORTENER_RETRY_BUDGET)
+        except CircuitOpenError:
+            return None
+        except asyncio.CancelledError:
+            # Lost a hedge race. The elapsed time is only how long the winner
+            # took, so it never becomes a latency sample; a call that was already
+            # past its own p95 counts as a failure (too slow), any other is ignored
+            elapsed = time.perf_counter() - started
+            hedge_delay = provider.hedge_delay()
+            if elapsed >= hedge_delay:
+                provider.record(hedge_delay, ok=False)
+            raise
+        except Exception as e:
+            provider.record(time.perf_counter() - started, ok=False)
+            print(f"Shortener Error ({provider.name}):", e)
+            return None
+        provider.record(time.perf_counter() - started, ok=True)
+        return short
+
+    async def _fetch_one(self, session, semaphore, long_url):
+        """
+        Shortens one URL with the best provider. If it hasn't answered within
+        its p95, the next provider gets the same request and the first answer
+        wins; a failed provider is replaced by the next one.
+        """
+        async with semaphore:
+            remaining = self.ranked_providers()
+            if not remaining:
+                self.stats["short_circuited"] += 1
+                return None
+
+            in_flight = {}
+            hedged = False
+            primary = None
+            try:
+                while remaining or in_flight:
+                    if not in_flight:
+                        provider = remaining.pop(0)
+                        task = asyncio.create_task(self._call_provider(provider, session, long_url))
+                        in_flight[task] = provider
+                        primary = primary or task
+
+                    hedge_after = None
+                    if remaining and not hedged:
+                        hedge_after = next(iter(in_flight.values())).hedge_delay()
+
+                    done, _ = await asyncio.wait(in_flight, timeout=hedge_after,
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        # Slower than its p95: race the next provider
+                        hedged = True
+                        self.stats["hedged"] += 1
+                        provider = remaining.pop(0)
+                        task = asyncio.create_task(self._call_provider(provider, session, long_url))
+                        in_flight[task] = provider
+                        continue
+
+                    for task in done:
+                        in_flight.pop(task)
+                        short = task.result()
+                        if short:
+                            if hedged and task is not primary:
+                                self.stats["hedge_wins"] += 1
+                            return short
+                return None
+            finally:
+                for task in in_flight:
+                    task.cancel()
+
+    async def shorten_many(self, long_urls):
+        """
+        Shorten a batch of URLs. Duplicates are coalesced into one lookup,
+        cache hits never touch the network and misses are dispatched
+        concurrently (bounded by `concurrency`).
+        Returns {long_url: short_url}; failed URLs map to themselves.
+        """
+        unique_urls = [u for u in dict.fromkeys(long_urls) if u]
+        self.stats["coalesced"] += len(long_urls) - len(unique_urls)
+        result = {}
+
+        # 1. In-process LRU
+        pending = []
+        for url in unique_urls:
+            cached = self.lru.get(url)
+            if cached:
+                self.stats["lru_hits"] += 1
+                result[url] = cached
+            else:
+                pending.append(url)
+
+        # 2. Persistent Mongo cache (single $in query)
+        if pending:
+            stored = await run_db(self._db_lookup, pending)
+            for url, short in stored.items():
+                self.stats["db_hits"] += 1
+                self.lru.set(url, short)
+                result[url] = short
+            pending = [u for u in pending if u not in stored]
+
+        # 3. Shortener API for the remaining misses
+        if pending:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                shorts = await asyncio.gather(
+                    *[self._fetch_one(session, semaphore, u) for u in pending])
+
+            fresh = {}
+            for url, short in zip(pending, shorts):
+                if short:
+                    self.lru.set(url, short)
+                    fresh[url] = short
+                result[url] = short or url
+
+            await run_db(self._db_store, fresh)
+
+        return result
@@ -0,0 +1,74 @@
+"""Every parser backend, scoped or not, must extract exactly what the full-tree html.parser does."""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import parsers  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures"
+BACKENDS = ["html.parser", "lxml", "selectolax"]
+
+
+def load(name):
+    return (FIXTURES / name).read_text(encoding="utf-8")
+
+
+def baseline(monkeypatch, func, html):
+    """The original extraction: html.parser over the whole document."""
+    monkeypatch.setattr(parsers, "PARSE_SCOPED", False)
+    return func(html, backend="html.parser")
+
+
+def require(backend):
+    if parsers.resolve_backend(backend) != backend:
+        pytest.skip(f"{backend} not installed")
+
+
+@pytest.mark.parametrize("scoped", [True, False])
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_listing_matches_baseline(monkeypatch, backend, scoped):
+    require(backend)
+    html = load("listing_page.html")
+    expected = baseline(monkeypatch, parsers.parse_listing, html)
+
+    monkeypatch.setattr(parsers, "PARSE_SCOPED", scoped)
+    assert parsers.parse_listing(html, backend=backend) == expected
+
+
+@pytest.mark.parametrize("scoped", [True, False])
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_movie_details_match_baseline(monkeypatch, backend, scoped):
+    require(backend)
+    html = load("inner_page.html")
+    expected = baseline(monkeypatch, parsers.parse_movie_details, html)
+
+    monkeypatch.setattr(parsers, "PARSE_SCOPED", scoped)
+    assert parsers.parse_movie_details(html, backend=backend) == expected
+
+
+def test_baseline_reads_fixtures(monkeypatch):
+    """Guards against fixtures that every backend agrees on only because nothing matches."""
+    listing = baseline(monkeypatch, parsers.parse_listing, load("listing_page.html"))
+    assert [m["title"] for m in listing["random_movies"]] == [
+        "The Last Harbor (2023)",
+        "Rock & Roll Nights (2022) Hindi Dubbed",
+        "Monsoon Diaries (2024) [Hindi + English]",
+    ]
+    assert [m["link"] for m in listing["latest_movies"]] == [
+        "https://uiiumovie.fun/city-of-glass-2024/",
+        "https://uiiumovie.fun/the-quiet-ones-s01/",
+        "https://uiiumovie.fun/monsoon-diaries-2024/",
+    ]
+
+    details = baseline(monkeypatch, parsers.parse_movie_details, load("inner_page.html"))
+    assert details["duration"] == "2h 14min"
+    assert [dl["url"] for dl in details["download_links"]] == [
+        "https://files.example/city-of-glass/480p",
+        "https://files.example/city-of-glass/720p?ref=uiiu&dl=1",
+        "https://files.example/city-of-glass/1080p",
+    ]